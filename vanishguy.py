@@ -1,19 +1,23 @@
 import os
-import json
+import html
+import orjson
 import time
 import random
 import asyncio
+import atexit
 import asyncpg
-import nest_asyncio
 import logging
-import threading
+import queue
+import signal
+import heapq
+import itertools
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime, timezone, timedelta
-from http.server import BaseHTTPRequestHandler, HTTPServer
-from typing import Dict, Optional, List, Any
+from typing import Dict, Optional, List, Any, Set
 from dotenv import load_dotenv
 from telegram import BotCommand, InlineKeyboardButton, InlineKeyboardMarkup, Update, Message
-from telegram.constants import ChatAction
 from telegram.ext import (
+    AIORateLimiter,
     ApplicationBuilder,
     CallbackQueryHandler,
     CommandHandler,
@@ -41,10 +45,18 @@ class ColoredFormatter(logging.Formatter):
         'ERROR': Colors.RED,
     }
 
+    def __init__(self, *args, use_color: bool = True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.use_color = use_color
+
     def format(self, record):
         # Get the original formatted message
         original_format = super().format(record)
 
+        # Plain output for log collectors that are not terminals
+        if not self.use_color:
+            return original_format
+
         # Get color based on log level
         color = self.COLORS.get(record.levelname, Colors.RESET)
 
@@ -53,6 +65,9 @@ class ColoredFormatter(logging.Formatter):
 
         return colored_format
 
+# Background thread writing queued log records to the console
+log_listener: Optional[QueueListener] = None
+
 # Configure logging with colors
 def setup_colored_logging():
     """Setup colored logging configuration"""
@@ -70,12 +85,21 @@ def setup_colored_logging():
     # Create colored formatter with enhanced format
     formatter = ColoredFormatter(
         fmt='%(asctime)s - %(name)s - [%(levelname)s] - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
+        datefmt='%Y-%m-%d %H:%M:%S',
+        use_color=console_handler.stream.isatty()
     )
     console_handler.setFormatter(formatter)
 
+    # Hand records to a background thread so console writes never block the event loop;
+    # stop it at interpreter exit so queued lines are written even on early exit(1)
+    global log_listener
+    log_queue = queue.SimpleQueue()
+    log_listener = QueueListener(log_queue, console_handler, respect_handler_level=True)
+    log_listener.start()
+    atexit.register(log_listener.stop)
+
     # Add handler to logger
-    logger.addHandler(console_handler)
+    logger.addHandler(QueueHandler(log_queue))
 
     return logger
 
@@ -97,35 +121,35 @@ def extract_user_info(msg: Message) -> Dict[str, any]:
         "chat_username": f"@{c.username}" if c.username else "No Username",
         "chat_link": f"https://t.me/{c.username}" if c.username else "No Link",
     }
-    logger.info(
-        f"📑 User info extracted: {info['full_name']} (@{info['username']}) "
-        f"[ID: {info['user_id']}] in {info['chat_title']} [{info['chat_id']}] {info['chat_link']}"
+    logger.debug(
+        "📑 User info extracted: %s (@%s) [ID: %s] in %s [%s] %s",
+        info['full_name'], info['username'], info['user_id'],
+        info['chat_title'], info['chat_id'], info['chat_link']
     )
     return info
 
+LOG_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+}
+
 def log_with_user_info(level: str, message: str, user_info: Dict[str, any]) -> None:
     """Log message with user information"""
+    log_level = LOG_LEVELS.get(level.upper(), logging.INFO)
+    if not logger.isEnabledFor(log_level):
+        return
+
     user_detail = (
         f"👤 {user_info['full_name']} (@{user_info['username']}) "
         f"[ID: {user_info['user_id']}] | "
         f"💬 {user_info['chat_title']} [{user_info['chat_id']}] "
         f"({user_info['chat_type']}) {user_info['chat_link']}"
     )
-    full_message = f"{message} | {user_detail}"
-
-    if level.upper() == "INFO":
-        logger.info(full_message)
-    elif level.upper() == "DEBUG":
-        logger.debug(full_message)
-    elif level.upper() == "WARNING":
-        logger.warning(full_message)
-    elif level.upper() == "ERROR":
-        logger.error(full_message)
-    else:
-        logger.info(full_message)
+    logger.log(log_level, "%s | %s", message, user_detail)
 
 # Initialize
-nest_asyncio.apply()
 load_dotenv()
 
 logger.info("🚀 Starting AFK Bot initialization...")
@@ -133,7 +157,17 @@ logger.info("🚀 Starting AFK Bot initialization...")
 # Configuration
 TOKEN = os.environ.get("BOT_TOKEN")
 DATABASE_URL = os.environ.get("DATABASE_URL", "")
+# Write-only outage journal for manual recovery; the bot never reads it back
 DATA_FILE = os.environ.get("DATA_FILE", "data.json")
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", 2))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", 10))
+PORT = int(os.environ.get("PORT", 10000))
+# PTB's webhook server only routes WEBHOOK_PATH, so in webhook mode the health
+# check needs its own port
+HEALTH_PORT = int(os.environ.get("HEALTH_PORT", PORT))
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "").rstrip("/")
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET")
+WEBHOOK_PATH = "telegram"
 
 if not TOKEN:
     logger.error("❌ BOT_TOKEN not found in environment variables!")
@@ -145,10 +179,31 @@ if not DATABASE_URL:
 
 logger.info(f"🗄️ Using PostgreSQL database")
 logger.info(f"📁 Backup data file: {DATA_FILE}")
+logger.info(f"📡 Update delivery: {'webhook at ' + WEBHOOK_URL if WEBHOOK_URL else 'long polling'}")
 
 # Global database pool
 db_pool = None
 
+# In-memory AFK state mirroring the afk_status table, keyed by (chat_id, user_id)
+afk_cache: Dict[tuple, Dict[str, Any]] = {}
+
+# AFK database writes waiting to be applied, in the order they happened
+afk_write_queue: asyncio.Queue = asyncio.Queue()
+
+# Last seen timestamps waiting to be written, keyed by (chat_id, user_id)
+last_seen_buffer: Dict[tuple, datetime] = {}
+LAST_SEEN_FLUSH_INTERVAL = 5  # seconds
+last_seen_flush_lock = asyncio.Lock()
+# Users idle this long were swept into AFK long ago; their last_seen row can go
+LAST_SEEN_RETENTION = timedelta(days=7)
+
+# Bot replies waiting to be auto-deleted, as a heap of (deadline, seq, message)
+AUTO_DELETE_DELAY = 60  # seconds
+deletion_heap: List[tuple] = []
+deletion_seq = itertools.count()  # Tie-breaker so Message objects are never compared
+deletion_wakeup = asyncio.Event()
+deletion_tasks: Set[asyncio.Task] = set()  # In-flight deletes, referenced until done
+
 # Message dictionaries
 START_MESSAGE = [
     "👋 Hello, {user}!",
@@ -162,6 +217,7 @@ START_MESSAGE = [
     "",
     "<i>Stay active, stay awesome!</i> ✨"
 ]
+START_TEMPLATE = "\n".join(START_MESSAGE)
 
 AFK_MESSAGES = [
     "{user} is now AFK: {reason}",
@@ -196,8 +252,20 @@ AFK_STATUS_MESSAGES = [
     "{user} stepped out: {reason}. Been away for {duration}"
 ]
 
-# Global lock for file operations (backup)
-file_lock = threading.Lock()
+# Backup state: the JSON snapshot plus an append-only change log. Only written
+# when a database write fails, and loaded lazily on the first such write; the
+# contents are never replayed into Postgres or the cache automatically
+BACKUP_LOG_FILE = f"{DATA_FILE}.log"
+BACKUP_SNAPSHOT_INTERVAL = 60  # seconds
+backup_data = None
+backup_log = None
+backup_dirty = False
+
+async def setup_connection(conn: asyncpg.Connection):
+    """Configure a pool connection each time it is acquired"""
+    # Set with SET rather than as a startup parameter, which PgBouncer rejects;
+    # re-applied on every acquire because the pool's RESET ALL on release undoes it
+    await conn.execute("SET idle_in_transaction_session_timeout = '30s'")
 
 async def init_database():
     """Initialize database connection and create tables"""
@@ -206,8 +274,16 @@ async def init_database():
     logger.info("🔗 Initializing database connection...")
     
     try:
-        # Create connection pool
-        db_pool = await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=10)
+        # Create connection pool; only the AFK writer, the last seen flusher and
+        # the inactivity sweep use it, so a few connections are plenty
+        db_pool = await asyncpg.create_pool(
+            DATABASE_URL,
+            min_size=DB_POOL_MIN,
+            max_size=DB_POOL_MAX,
+            command_timeout=10,
+            server_settings={"application_name": "vanishguy"},
+            setup=setup_connection
+        )
         logger.info("✅ Database connection pool created successfully")
         
         # Create tables if they don't exist
@@ -248,13 +324,20 @@ async def init_database():
                 ON last_seen (chat_id, user_id)
             ''')
             
+            # Covering index so the inactivity sweep is an index-only scan
+            await conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_last_seen_seen_at_covering
+                ON last_seen (seen_at) INCLUDE (chat_id, user_id)
+            ''')
+            
             await conn.execute('''
-                CREATE INDEX IF NOT EXISTS idx_last_seen_seen_at 
-                ON last_seen (seen_at)
+                DROP INDEX IF EXISTS idx_last_seen_seen_at
             ''')
             
         logger.info("✅ Database tables created/verified successfully")
         
+        await load_afk_cache()
+        
     except Exception as e:
         logger.error(f"❌ Database initialization failed: {e}")
         raise
@@ -267,47 +350,136 @@ async def close_database():
         await db_pool.close()
         logger.info("🔌 Database connection pool closed")
 
+async def load_afk_cache():
+    """Load all AFK records from the database into the in-memory cache"""
+    logger.debug("📥 Loading AFK records into cache")
+
+    rows = await db_pool.fetch('''
+        SELECT chat_id, user_id, reason, since FROM afk_status
+    ''')
+
+    afk_cache.clear()
+    for row in rows:
+        afk_cache[(row["chat_id"], row["user_id"])] = {
+            "reason": row["reason"],
+            "since": row["since"]
+        }
+
+    logger.info(f"✅ Loaded {len(afk_cache)} AFK records into cache")
+
 # Backup functions (keeping JSON as fallback)
 def load_data():
-    """Load data from JSON file with error handling (backup only)"""
-    logger.debug(f"📂 Loading backup data from {DATA_FILE}")
-    try:
-        if not os.path.exists(DATA_FILE):
-            logger.warning(f"⚠️ Backup data file {DATA_FILE} not found, creating new one")
-            default_data = {"leaderboard": {}, "afk": {}, "last_seen": {}}
-            save_data(default_data)
-            return default_data
+    """Load backup data from the JSON snapshot and replay the change log (backup only)"""
+    global backup_data
+    
+    if backup_data is not None:
+        return backup_data
         
-        with open(DATA_FILE, "r") as f:
-            data = json.load(f)
-            logger.debug(f"✅ Successfully loaded backup data")
-            return data
+    logger.debug("📂 Loading backup data from %s", DATA_FILE)
+    data = {"leaderboard": {}, "afk": {}, "last_seen": {}}
+    torn_log = False
+    try:
+        if os.path.exists(DATA_FILE):
+            with open(DATA_FILE, "rb") as f:
+                data = orjson.loads(f.read())
+        else:
+            logger.warning(f"⚠️ Backup data file {DATA_FILE} not found, starting empty")
+            
+        if os.path.exists(BACKUP_LOG_FILE):
+            with open(BACKUP_LOG_FILE, "rb") as f:
+                for line in f:
+                    try:
+                        apply_backup_change(data, orjson.loads(line))
+                    except ValueError:
+                        # A torn final line from a crash mid-write
+                        torn_log = True
+                        break
+                        
+        logger.debug("✅ Successfully loaded backup data")
     except Exception as e:
         logger.error(f"❌ Error loading backup data: {e}")
-        return {"leaderboard": {}, "afk": {}, "last_seen": {}}
+        
+    backup_data = data
+    if torn_log:
+        # Rewrite the snapshot so new entries are not appended after the torn line
+        save_data(data)
+    return data
 
 def save_data(data):
-    """Save data to JSON file with error handling (backup only)"""
-    logger.debug(f"💾 Saving backup data to {DATA_FILE}")
+    """Write a compact snapshot of the backup data and truncate the change log (backup only)"""
+    global backup_log, backup_dirty
+    
+    logger.debug("💾 Saving backup data to %s", DATA_FILE)
     try:
-        with open(DATA_FILE, "w") as f:
-            json.dump(data, f, indent=4)
+        tmp_file = f"{DATA_FILE}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(orjson.dumps(data))
+        os.replace(tmp_file, DATA_FILE)
+        
+        # Everything in the log is now part of the snapshot
+        if backup_log is not None:
+            backup_log.close()
+            backup_log = None
+        open(BACKUP_LOG_FILE, "w").close()
+        backup_dirty = False
         logger.debug("✅ Backup data saved successfully")
     except Exception as e:
         logger.error(f"❌ Error saving backup data to {DATA_FILE}: {e}")
 
-async def set_afk(chat_id: int, user_id: int, reason: str, since: datetime):
-    """Set user as AFK with database storage"""
-    logger.debug(f"⏰ Setting AFK for user {user_id} in chat {chat_id} with reason: {reason}")
+def apply_backup_change(data: Dict[str, Any], change: Dict[str, Any]):
+    """Apply a single change log entry to backup data"""
+    section = data.setdefault(change["s"], {})
+    if "v" in change:
+        section[change["k"]] = change["v"]
+    else:
+        section.pop(change["k"], None)
+
+def write_backup(section: str, key: str, value: Any = None):
+    """Record a backup change in memory and append it to the change log; None deletes the key"""
+    global backup_log, backup_dirty
+    
+    change = {"s": section, "k": key}
+    if value is not None:
+        change["v"] = value
+    apply_backup_change(load_data(), change)
+    
+    if backup_log is None:
+        backup_log = open(BACKUP_LOG_FILE, "ab", buffering=0)
+    backup_log.write(orjson.dumps(change) + b"\n")
+    backup_dirty = True
+
+async def backup_snapshotter():
+    """Background task to periodically fold the backup change log into a snapshot"""
+    logger.info("📸 Starting backup snapshot task")
     
+    while True:
+        await asyncio.sleep(BACKUP_SNAPSHOT_INTERVAL)
+        if backup_dirty:
+            save_data(load_data())
+
+def set_afk(chat_id: int, user_id: int, reason: str, since: datetime):
+    """Set user as AFK in the cache and queue the database write"""
+    logger.debug("⏰ Setting AFK for user %s in chat %s with reason: %s", user_id, chat_id, reason)
+    afk_cache[(chat_id, user_id)] = {"reason": reason, "since": since}
+    afk_write_queue.put_nowait((store_afk, (chat_id, user_id, reason, since)))
+
+def remove_afk(chat_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+    """Remove user from AFK status in the cache and queue the database write, returning the removed entry"""
+    afk = afk_cache.pop((chat_id, user_id), None)
+    if afk is not None:
+        logger.debug("🔄 Removing AFK status for user %s in chat %s", user_id, chat_id)
+        afk_write_queue.put_nowait((delete_afk, (chat_id, user_id)))
+    return afk
+
+async def store_afk(chat_id: int, user_id: int, reason: str, since: datetime):
+    """Write AFK status for user to database storage"""
     try:
-        async with db_pool.acquire() as conn:
-            await conn.execute('''
-                INSERT INTO afk_status (chat_id, user_id, reason, since)
-                VALUES ($1, $2, $3, $4)
-                ON CONFLICT (chat_id, user_id)
-                DO UPDATE SET reason = $3, since = $4, created_at = NOW()
-            ''', chat_id, user_id, reason, since)
+        await db_pool.execute('''
+            INSERT INTO afk_status (chat_id, user_id, reason, since)
+            VALUES ($1, $2, $3, $4)
+            ON CONFLICT (chat_id, user_id)
+            DO UPDATE SET reason = $3, since = $4, created_at = NOW()
+        ''', chat_id, user_id, reason, since)
             
         logger.info(f"✅ User {user_id} set as AFK in chat {chat_id}")
         
@@ -315,26 +487,18 @@ async def set_afk(chat_id: int, user_id: int, reason: str, since: datetime):
         logger.error(f"❌ Error setting AFK for user {user_id}: {e}")
         # Try backup method
         try:
-            with file_lock:
-                data = load_data()
-                data.setdefault("afk", {})
-                key = f"{chat_id}:{user_id}"
-                data["afk"][key] = {"reason": reason, "since": since.isoformat()}
-                save_data(data)
-                logger.warning(f"⚠️ Used backup storage for AFK user {user_id}")
+            write_backup("afk", f"{chat_id}:{user_id}", {"reason": reason, "since": since.isoformat()})
+            logger.warning(f"⚠️ Used backup storage for AFK user {user_id}")
         except Exception as backup_error:
             logger.error(f"❌ Backup storage also failed: {backup_error}")
 
-async def remove_afk(chat_id: int, user_id: int):
-    """Remove user from AFK status with database storage"""
-    logger.debug(f"🔄 Removing AFK status for user {user_id} in chat {chat_id}")
-    
+async def delete_afk(chat_id: int, user_id: int):
+    """Delete AFK status for user from database storage"""
     try:
-        async with db_pool.acquire() as conn:
-            result = await conn.execute('''
-                DELETE FROM afk_status 
-                WHERE chat_id = $1 AND user_id = $2
-            ''', chat_id, user_id)
+        await db_pool.execute('''
+            DELETE FROM afk_status 
+            WHERE chat_id = $1 AND user_id = $2
+        ''', chat_id, user_id)
             
         logger.info(f"✅ AFK status removed for user {user_id} in chat {chat_id}")
         
@@ -342,153 +506,169 @@ async def remove_afk(chat_id: int, user_id: int):
         logger.error(f"❌ Error removing AFK for user {user_id}: {e}")
         # Try backup method
         try:
-            with file_lock:
-                data = load_data()
-                key = f"{chat_id}:{user_id}"
-                if key in data.get("afk", {}):
-                    del data["afk"][key]
-                    save_data(data)
-                    logger.warning(f"⚠️ Used backup storage to remove AFK user {user_id}")
+            write_backup("afk", f"{chat_id}:{user_id}")
+            logger.warning(f"⚠️ Used backup storage to remove AFK user {user_id}")
         except Exception as backup_error:
             logger.error(f"❌ Backup storage also failed: {backup_error}")
 
-async def get_afk(chat_id: int, user_id: int) -> Optional[Dict[str, Any]]:
-    """Get AFK status for user with database storage"""
-    logger.debug(f"🔍 Checking AFK status for user {user_id} in chat {chat_id}")
+async def afk_writer():
+    """Background task that applies queued AFK writes to the database in order"""
+    logger.info("✍️ Starting AFK writer task")
     
-    try:
-        async with db_pool.acquire() as conn:
-            row = await conn.fetchrow('''
-                SELECT reason, since FROM afk_status 
-                WHERE chat_id = $1 AND user_id = $2
-            ''', chat_id, user_id)
-            
-        if not row:
-            logger.debug(f"ℹ️ User {user_id} is not AFK in chat {chat_id}")
-            return None
-            
-        result = {
-            "reason": row["reason"],
-            "since": row["since"].replace(tzinfo=timezone.utc)
-        }
-        logger.debug(f"✅ Found AFK status for user {user_id}: {result['reason']}")
-        return result
-        
-    except Exception as e:
-        logger.error(f"❌ Error getting AFK status for user {user_id}: {e}")
-        # Try backup method
+    while True:
+        write, args = await afk_write_queue.get()
         try:
-            data = load_data()
-            key = f"{chat_id}:{user_id}"
-            entry = data.get("afk", {}).get(key)
-            if not entry:
-                return None
-            entry_copy = entry.copy()
-            entry_copy["since"] = datetime.fromisoformat(entry_copy["since"]).replace(tzinfo=timezone.utc)
-            logger.warning(f"⚠️ Used backup storage for AFK check user {user_id}")
-            return entry_copy
-        except Exception as backup_error:
-            logger.error(f"❌ Backup storage also failed: {backup_error}")
-            return None
+            await write(*args)
+        finally:
+            afk_write_queue.task_done()
+
+def get_afk(chat_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+    """Get AFK status for user from the in-memory cache"""
+    return afk_cache.get((chat_id, user_id))
+
+def update_last_seen(chat_id: int, user_id: int, seen_at: datetime):
+    """Buffer last seen timestamp for user until the next flush"""
+    last_seen_buffer[(chat_id, user_id)] = seen_at
 
-async def update_last_seen(chat_id: int, user_id: int, seen_at: datetime):
-    """Update last seen timestamp for user with database storage"""
-    logger.debug(f"👁️ Updating last seen for user {user_id} in chat {chat_id}")
+async def flush_last_seen():
+    """Write all buffered last seen timestamps to the database in one batch"""
+    global last_seen_buffer
     
-    try:
-        async with db_pool.acquire() as conn:
-            await conn.execute('''
-                INSERT INTO last_seen (chat_id, user_id, seen_at)
-                VALUES ($1, $2, $3)
-                ON CONFLICT (chat_id, user_id)
-                DO UPDATE SET seen_at = $3, updated_at = NOW()
-            ''', chat_id, user_id, seen_at)
+    # Serialize flushes so a caller waits for any write already in flight and
+    # an older batch can never commit after a newer one
+    async with last_seen_flush_lock:
+        if not last_seen_buffer:
+            return
             
-    except Exception as e:
-        logger.error(f"❌ Error updating last seen for user {user_id}: {e}")
-        # Try backup method
+        buffer, last_seen_buffer = last_seen_buffer, {}
+        logger.debug("👁️ Flushing %d last seen updates", len(buffer))
+        
         try:
-            with file_lock:
-                data = load_data()
-                data.setdefault("last_seen", {})
-                key = f"{chat_id}:{user_id}"
-                data["last_seen"][key] = seen_at.isoformat()
-                save_data(data)
-                logger.warning(f"⚠️ Used backup storage for last seen user {user_id}")
-        except Exception as backup_error:
-            logger.error(f"❌ Backup storage also failed: {backup_error}")
+            async with db_pool.acquire() as conn:
+                async with conn.transaction():
+                    # COPY into a per-connection staging table, then merge with one statement
+                    await conn.execute('''
+                        CREATE TEMP TABLE IF NOT EXISTS last_seen_stage (
+                            chat_id BIGINT,
+                            user_id BIGINT,
+                            seen_at TIMESTAMPTZ
+                        ) ON COMMIT DELETE ROWS
+                    ''')
+                    await conn.copy_records_to_table(
+                        'last_seen_stage',
+                        records=[(chat_id, user_id, seen_at) for (chat_id, user_id), seen_at in buffer.items()],
+                        columns=('chat_id', 'user_id', 'seen_at')
+                    )
+                    await conn.execute('''
+                        INSERT INTO last_seen (chat_id, user_id, seen_at)
+                        SELECT chat_id, user_id, seen_at FROM last_seen_stage
+                        ON CONFLICT (chat_id, user_id)
+                        DO UPDATE SET seen_at = EXCLUDED.seen_at, updated_at = NOW()
+                    ''')
+                
+        except Exception as e:
+            logger.error(f"❌ Error flushing {len(buffer)} last seen updates: {e}")
+            # Try backup method
+            try:
+                for (chat_id, user_id), seen_at in buffer.items():
+                    write_backup("last_seen", f"{chat_id}:{user_id}", seen_at.isoformat())
+                logger.warning(f"⚠️ Used backup storage for {len(buffer)} last seen updates")
+            except Exception as backup_error:
+                logger.error(f"❌ Backup storage also failed: {backup_error}")
+
+async def last_seen_flusher():
+    """Background task to periodically flush buffered last seen updates"""
+    logger.info("💾 Starting last seen flusher task")
+    
+    while True:
+        await asyncio.sleep(LAST_SEEN_FLUSH_INTERVAL)
+        await flush_last_seen()
 
-async def get_all_last_seen() -> List[Dict[str, Any]]:
-    """Get all last seen records with database storage"""
-    logger.debug("📊 Retrieving all last seen records")
+async def sweep_inactive(cutoff: datetime) -> List[Dict[str, Any]]:
+    """Mark every user not seen since cutoff as AFK in a single statement"""
+    logger.debug("🧹 Sweeping users inactive since %s", cutoff)
     
     try:
-        async with db_pool.acquire() as conn:
-            rows = await conn.fetch('''
-                SELECT chat_id, user_id, seen_at 
-                FROM last_seen
-                ORDER BY seen_at DESC
-            ''')
+        rows = await db_pool.fetch('''
+            INSERT INTO afk_status (chat_id, user_id, reason, since)
+            SELECT chat_id, user_id, 'No activity', seen_at
+            FROM last_seen
+            WHERE seen_at < $1
+            ON CONFLICT (chat_id, user_id) DO NOTHING
+            RETURNING chat_id, user_id, reason, since
+        ''', cutoff)
             
         items = []
         for row in rows:
-            items.append({
-                "chat_id": row["chat_id"],
-                "user_id": row["user_id"],
-                "seen_at": row["seen_at"].replace(tzinfo=timezone.utc)
-            })
+            entry = {
+                "reason": row["reason"],
+                "since": row["since"]
+            }
+            # Keep any AFK status already recorded in-process
+            afk_cache.setdefault((row["chat_id"], row["user_id"]), entry)
+            items.append({"chat_id": row["chat_id"], "user_id": row["user_id"], **entry})
             
-        logger.debug(f"✅ Retrieved {len(items)} last seen records from database")
+        logger.debug("✅ Swept %d inactive users into AFK", len(items))
         return items
         
     except Exception as e:
-        logger.error(f"❌ Error getting last seen records: {e}")
-        # Try backup method
-        try:
-            data = load_data()
-            items = []
-            for key, iso in data.get("last_seen", {}).items():
-                chat_id, user_id = key.split(":")
-                items.append({
-                    "chat_id": int(chat_id),
-                    "user_id": int(user_id),
-                    "seen_at": datetime.fromisoformat(iso).replace(tzinfo=timezone.utc)
-                })
-            logger.warning(f"⚠️ Used backup storage for last seen records: {len(items)} records")
-            return items
-        except Exception as backup_error:
-            logger.error(f"❌ Backup storage also failed: {backup_error}")
-            return []
+        logger.error(f"❌ Error sweeping inactive users: {e}")
+        return []
+
+# Units used by format_afk_time, largest first
+TIME_UNITS = (
+    ("year", 31536000),
+    ("month", 2592000),
+    ("day", 86400),
+    ("hour", 3600),
+    ("minute", 60),
+    ("second", 1),
+)
+
+async def purge_last_seen(cutoff: datetime):
+    """Delete last seen records older than cutoff so the sweep stays bounded"""
+    logger.debug("🧹 Purging last seen records older than %s", cutoff)
+    
+    try:
+        result = await db_pool.execute('''
+            DELETE FROM last_seen WHERE seen_at < $1
+        ''', cutoff)
+        
+        logger.info(f"🧹 Purged stale last seen records: {result}")
+        
+    except Exception as e:
+        logger.error(f"❌ Error purging last seen records: {e}")
 
 def format_afk_time(delta: timedelta) -> str:
     """Format time delta into human readable string"""
-    seconds = int(delta.total_seconds())
-    years, remainder = divmod(seconds, 31536000)
-    months, remainder = divmod(remainder, 2592000)
-    days, remainder = divmod(remainder, 86400)
-    hours, remainder = divmod(remainder, 3600)
-    minutes, seconds = divmod(remainder, 60)
+    remainder = delta.days * 86400 + delta.seconds
     parts = []
-    if years > 0:
-        parts.append(f"{years} year{'s' if years != 1 else ''}")
-    if months > 0:
-        parts.append(f"{months} month{'s' if months != 1 else ''}")
-    if days > 0:
-        parts.append(f"{days} day{'s' if days != 1 else ''}")
-    if hours > 0:
-        parts.append(f"{hours} hour{'s' if hours != 1 else ''}")
-    if minutes > 0:
-        parts.append(f"{minutes} minute{'s' if minutes != 1 else ''}")
-    if seconds > 0 or not parts:
-        parts.append(f"{seconds} second{'s' if seconds != 1 else ''}")
-    return " ".join(parts)
-
-def create_delete_keyboard():
-    """Create inline keyboard with delete button"""
+    for name, size in TIME_UNITS:
+        count, remainder = divmod(remainder, size)
+        if count:
+            parts.append(f"{count} {name}{'s' if count != 1 else ''}")
+    return " ".join(parts) or "0 seconds"
+
+def create_start_keyboard(bot_username: str):
+    """Create inline keyboard for the /start message"""
     return InlineKeyboardMarkup([
-        [InlineKeyboardButton("🗑️", callback_data="delete_message")]
+        [
+            InlineKeyboardButton("Updates", url="https://t.me/WorkGlows"),
+            InlineKeyboardButton("Support", url="https://t.me/SoulMeetsHQ")
+        ],
+        [
+            InlineKeyboardButton("Add Me To Your Group", url=f"https://t.me/{bot_username}?startgroup=true")
+        ]
     ])
 
+DELETE_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🗑️", callback_data="delete_message")]
+])
+
+def create_delete_keyboard():
+    """Return the shared inline keyboard with delete button"""
+    return DELETE_KEYBOARD
+
 async def delete_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle delete button callback"""
     query = update.callback_query
@@ -506,15 +686,53 @@ async def delete_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         log_with_user_info("ERROR", f"❌ Failed to delete message: {e}", user_info)
 
 
-async def delete_message_after_delay(message: Message, delay: int):
-    """Delete a message after a specified delay."""
-    await asyncio.sleep(delay)
+def schedule_delete(message: Message, delay: float = AUTO_DELETE_DELAY):
+    """Queue a message for automatic deletion after delay seconds"""
+    heapq.heappush(deletion_heap, (time.monotonic() + delay, next(deletion_seq), message))
+    deletion_wakeup.set()
+
+async def send_temporary_reply(message: Message, text: str) -> Message:
+    """Reply with HTML text and a delete button, and queue the reply for auto-deletion"""
+    sent_msg = await message.reply_html(text, reply_markup=create_delete_keyboard())
+    schedule_delete(sent_msg)
+    return sent_msg
+
+async def delete_message(message: Message):
+    """Delete an auto-deleted message, logging instead of raising on failure"""
     try:
         await message.delete()
-        logger.info(f"🗑️ Automatically deleted message {message.message_id} after {delay} seconds.")
+        logger.info(f"🗑️ Automatically deleted message {message.message_id}.")
     except Exception as e:
         logger.warning(f"⚠️ Could not auto-delete message {message.message_id}: {e}")
 
+async def message_reaper():
+    """Background task that deletes queued messages once their delay expires"""
+    logger.info("🗑️ Starting message reaper task")
+    
+    while True:
+        deletion_wakeup.clear()
+        if not deletion_heap:
+            await deletion_wakeup.wait()
+            continue
+            
+        remaining = deletion_heap[0][0] - time.monotonic()
+        if remaining > 0:
+            # Wake early if a message with a sooner deadline is scheduled
+            try:
+                await asyncio.wait_for(deletion_wakeup.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+            continue
+            
+        # Send every due delete on its own task so one rate-limited group
+        # doesn't hold up deletions in all the other chats
+        now = time.monotonic()
+        while deletion_heap and deletion_heap[0][0] <= now:
+            _, _, message = heapq.heappop(deletion_heap)
+            task = asyncio.create_task(delete_message(message))
+            deletion_tasks.add(task)
+            task.add_done_callback(deletion_tasks.discard)
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /start command"""
     user_info = extract_user_info(update.message)
@@ -522,22 +740,15 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         user = update.effective_user
-        bot_username = context.bot.username
         
-        logger.debug(f"🤖 Bot username: {bot_username}")
-        await context.bot.send_chat_action(chat_id=update.effective_chat.id, action=ChatAction.TYPING)
-        
-        keyboard = InlineKeyboardMarkup([
-            [
-                InlineKeyboardButton("Updates", url="https://t.me/WorkGlows"),
-                InlineKeyboardButton("Support", url="https://t.me/SoulMeetsHQ")
-            ],
-            [
-                InlineKeyboardButton("Add Me To Your Group", url=f"https://t.me/{bot_username}?startgroup=true")
-            ]
-        ])
-
-        message_text = "\n".join(START_MESSAGE).format(user=user.mention_html())
+        # The keyboard only depends on the bot username, so build it once
+        keyboard = context.bot_data.get("start_keyboard")
+        if keyboard is None:
+            bot_username = context.bot.username
+            logger.debug("🤖 Bot username: %s", bot_username)
+            keyboard = context.bot_data["start_keyboard"] = create_start_keyboard(bot_username)
+
+        message_text = START_TEMPLATE.format(user=user.mention_html())
 
         await update.message.reply_html(message_text, reply_markup=keyboard)
         log_with_user_info("INFO", "✅ Start message sent successfully", user_info)
@@ -548,7 +759,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def afk_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /afk command"""
     user_info = extract_user_info(update.message)
-    reason = " ".join(context.args) if context.args else "AFK"
+    # Split off the command in one pass; keeps the reason exactly as typed
+    parts = update.message.text.split(None, 1)
+    reason = parts[1].rstrip() if len(parts) > 1 else "AFK"
     
     log_with_user_info("INFO", f"😴 /afk command received with reason: {reason}", user_info)
     
@@ -557,18 +770,14 @@ async def afk_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         chat_id = update.effective_chat.id
         now = datetime.now(timezone.utc)
         
-        await set_afk(chat_id, user.id, reason, now)
+        set_afk(chat_id, user.id, reason, now)
 
         message = random.choice(AFK_MESSAGES).format(
             user=user.mention_html(),
-            reason=reason
+            reason=html.escape(reason)
         )
 
-        sent_msg = await update.message.reply_html(
-            message,
-            reply_markup=create_delete_keyboard()
-        )
-        asyncio.create_task(delete_message_after_delay(sent_msg, 60))
+        await send_temporary_reply(update.message, message)
         
         log_with_user_info("INFO", f"✅ AFK status set successfully", user_info)
     except Exception as e:
@@ -583,29 +792,21 @@ async def back_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         user = update.effective_user
         chat_id = update.effective_chat.id
-        afk = await get_afk(chat_id, user.id)
+        now = datetime.now(timezone.utc)
+        afk = remove_afk(chat_id, user.id)
         
         if afk:
-            delta = datetime.now(timezone.utc) - afk["since"]
-            await remove_afk(chat_id, user.id)
+            duration = format_afk_time(now - afk["since"])
 
             message = random.choice(BACK_MESSAGES).format(
                 user=user.mention_html(),
-                duration=format_afk_time(delta)
+                duration=duration
             )
 
-            sent_msg = await update.message.reply_html(
-                message,
-                reply_markup=create_delete_keyboard()
-            )
-            asyncio.create_task(delete_message_after_delay(sent_msg, 60))
-            log_with_user_info("INFO", f"✅ User returned from AFK after {format_afk_time(delta)}", user_info)
+            await send_temporary_reply(update.message, message)
+            log_with_user_info("INFO", f"✅ User returned from AFK after {duration}", user_info)
         else:
-            sent_msg = await update.message.reply_text(
-                "You are not AFK.",
-                reply_markup=create_delete_keyboard()
-            )
-            asyncio.create_task(delete_message_after_delay(sent_msg, 60))
+            await send_temporary_reply(update.message, "You are not AFK.")
             log_with_user_info("INFO", "ℹ️ User tried /back but was not AFK", user_info)
     except Exception as e:
         logger.error(f"❌ Error in back command: {e}")
@@ -643,62 +844,68 @@ async def ping_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle all incoming messages"""
-    if not update.message:
+    msg = update.message
+    if not msg:
         return
     
     try:
         chat_id = update.effective_chat.id
         user = update.effective_user
         
+        if user is None:
+            return
+            
         if user.is_bot:
-            logger.debug(f"🤖 Ignoring message from bot: {user.username}")
+            logger.debug("🤖 Ignoring message from bot: %s", user.username)
             return
             
-        user_info = extract_user_info(update.message)
-        logger.debug(f"💬 Processing message from user")
+        logger.debug("💬 Processing message from user")
         
         now = datetime.now(timezone.utc)
-        await update_last_seen(chat_id, user.id, now)
+        update_last_seen(chat_id, user.id, now)
+        
+        # Replies are independent of each other, so they are sent together below
+        replies = []
+        notes = []
         
         # Check if user was AFK and auto-return them
-        afk = await get_afk(chat_id, user.id)
+        afk = remove_afk(chat_id, user.id)
         if afk:
-            delta = now - afk["since"]
-            await remove_afk(chat_id, user.id)
+            duration = format_afk_time(now - afk["since"])
 
             message = random.choice(BACK_MESSAGES).format(
                 user=user.mention_html(),
-                duration=format_afk_time(delta)
+                duration=duration
             )
 
-            sent_msg = await update.message.reply_html(
-                message,
-                reply_markup=create_delete_keyboard()
-            )
-            asyncio.create_task(delete_message_after_delay(sent_msg, 60))
-            log_with_user_info("INFO", f"🔄 Auto-returned user from AFK after {format_afk_time(delta)}", user_info)
+            replies.append(send_temporary_reply(msg, message))
+            notes.append(f"🔄 Auto-returned user from AFK after {duration}")
         
         # Check if user replied to someone who is AFK
-        if update.message.reply_to_message:
-            replied_user = update.message.reply_to_message.from_user
+        reply_to = msg.reply_to_message
+        if reply_to:
+            replied_user = reply_to.from_user
             if replied_user:
-                logger.debug(f"📤 Message is a reply to user {replied_user.id}")
-                afk = await get_afk(chat_id, replied_user.id)
+                logger.debug("📤 Message is a reply to user %s", replied_user.id)
+                afk = get_afk(chat_id, replied_user.id)
                 if afk:
                     delta = now - afk["since"]
 
                     message = random.choice(AFK_STATUS_MESSAGES).format(
                         user=replied_user.mention_html(),
-                        reason=afk['reason'],
+                        reason=html.escape(afk['reason']),
                         duration=format_afk_time(delta)
                     )
 
-                    sent_msg = await update.message.reply_html(
-                        message,
-                        reply_markup=create_delete_keyboard()
-                    )
-                    asyncio.create_task(delete_message_after_delay(sent_msg, 60))
-                    log_with_user_info("INFO", f"ℹ️ Notified about AFK user: {replied_user.full_name}", user_info)
+                    replies.append(send_temporary_reply(msg, message))
+                    notes.append(f"ℹ️ Notified about AFK user: {replied_user.full_name}")
+                    
+        if replies:
+            await asyncio.gather(*replies)
+            # Only build user details for messages that actually get a response
+            user_info = extract_user_info(msg)
+            for note in notes:
+                log_with_user_info("INFO", note, user_info)
     except Exception as e:
         logger.error(f"❌ Error in message handler: {e}")
 
@@ -707,45 +914,65 @@ async def check_inactivity():
     logger.info("⏰ Starting inactivity checker task")
     await asyncio.sleep(10)  # Initial delay
     
+    loop = asyncio.get_running_loop()
     check_count = 0
+    last_purge = loop.time()
     while True:
+        started = loop.time()
         try:
             check_count += 1
-            logger.debug(f"🔍 Running inactivity check #{check_count}")
+            logger.debug("🔍 Running inactivity check #%d", check_count)
+            
+            # Make sure recent activity is in the table before sweeping it
+            await flush_last_seen()
             
             now = datetime.now(timezone.utc)
-            records = await get_all_last_seen()
+            records = await sweep_inactive(now - timedelta(minutes=60))
             
-            inactive_users = 0
             for record in records:
-                chat_id = record["chat_id"]
-                user_id = record["user_id"]
-                last_time = record["seen_at"]
-                inactive_time = now - last_time
-                
-                afk = await get_afk(chat_id, user_id)
-                if inactive_time > timedelta(minutes=60) and not afk:
-                    await set_afk(chat_id, user_id, "No activity", last_time)
-                    inactive_users += 1
-                    logger.info(f"😴 Auto-set user {user_id} as AFK due to {format_afk_time(inactive_time)} of inactivity")
+                inactive_time = now - record["since"]
+                logger.info(f"😴 Auto-set user {record['user_id']} as AFK due to {format_afk_time(inactive_time)} of inactivity")
             
             if check_count % 10 == 0:  # Log summary every 10 checks
-                logger.info(f"📊 Inactivity check #{check_count}: {len(records)} users monitored, {inactive_users} set as AFK")
+                logger.info(f"📊 Inactivity check #{check_count}: {len(records)} users set as AFK")
+                
+            if loop.time() - last_purge >= 3600:  # Prune long-idle users every hour
+                await purge_last_seen(now - LAST_SEEN_RETENTION)
+                last_purge = loop.time()
                 
         except Exception as e:
             logger.error(f"❌ Error in inactivity checker: {e}")
         
-        await asyncio.sleep(60)  # Check every minute
+        # Check every minute, backing off if sweeps get slow
+        took = loop.time() - started
+        await asyncio.sleep(max(60, took * 4))
 
 async def main():
     """Main bot function"""
     logger.info("🤖 Starting main bot function")
     
+    # Answer health checks right away, unless the webhook server owns the port
+    if WEBHOOK_URL and HEALTH_PORT == PORT:
+        logger.warning("⚠️ No health check endpoint in webhook mode; set HEALTH_PORT to serve one")
+        health_server = None
+    else:
+        health_server = await start_health_server()
+    
     try:
         # Initialize database first
         await init_database()
         
-        app = ApplicationBuilder().token(TOKEN).build()
+        # Process updates concurrently so slow Bot API calls in one chat don't
+        # hold up every other chat; PTB's bot request pool already allows many
+        # parallel connections. The rate limiter queues outgoing calls to stay
+        # within Telegram's flood limits instead of running into 429s
+        app = (
+            ApplicationBuilder()
+            .token(TOKEN)
+            .concurrent_updates(True)
+            .rate_limiter(AIORateLimiter())
+            .build()
+        )
         logger.info("✅ Bot application built successfully")
         
         # Only register visible commands in the menu
@@ -754,9 +981,6 @@ async def main():
             BotCommand("afk", "Set yourself AFK"),
             BotCommand("back", "Return from AFK"),
         ]
-        
-        await app.bot.set_my_commands(commands)
-        logger.info(f"📋 Bot commands registered: {[cmd.command for cmd in commands]}")
 
         # Add handlers (ping command is added but not registered in menu)
         app.add_handler(CommandHandler("start", start))
@@ -764,66 +988,130 @@ async def main():
         app.add_handler(CommandHandler("back", back_command))
         app.add_handler(CommandHandler("ping", ping_command))  # Hidden command
         app.add_handler(CallbackQueryHandler(delete_callback, pattern="delete_message"))
-        app.add_handler(MessageHandler(filters.ALL, message_handler))
+        # Only user-authored group messages count as activity; skip edits, service
+        # messages (joins, pins, ...) and channel posts auto-forwarded into the group
+        app.add_handler(MessageHandler(
+            filters.ChatType.GROUPS
+            & filters.UpdateType.MESSAGE
+            & ~filters.StatusUpdate.ALL
+            & ~filters.IS_AUTOMATIC_FORWARD,
+            message_handler
+        ))
         
         logger.info("✅ All handlers registered successfully")
 
-        # Start background task
+        # Start background tasks
+        asyncio.create_task(afk_writer())
+        logger.info("✍️ AFK writer task started")
         asyncio.create_task(check_inactivity())
         logger.info("⏰ Inactivity checker task started")
+        asyncio.create_task(last_seen_flusher())
+        logger.info("💾 Last seen flusher task started")
+        asyncio.create_task(backup_snapshotter())
+        logger.info("📸 Backup snapshot task started")
+        asyncio.create_task(message_reaper())
+        logger.info("🗑️ Message reaper task started")
         
-        logger.info("🚀 Bot started with PostgreSQL database storage...")
+        # Stop gracefully on SIGINT/SIGTERM, as run_polling() used to
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except NotImplementedError:
+                pass  # Not supported on Windows
         
         try:
-            await app.run_polling()
+            async with app:
+                await app.bot.set_my_commands(commands)
+                logger.info(f"📋 Bot commands registered: {[cmd.command for cmd in commands]}")
+                
+                await app.start()
+                try:
+                    if WEBHOOK_URL:
+                        # Telegram pushes updates to us; PTB's webhook server owns PORT
+                        await app.updater.start_webhook(
+                            listen="0.0.0.0",
+                            port=PORT,
+                            url_path=WEBHOOK_PATH,
+                            secret_token=WEBHOOK_SECRET,
+                            webhook_url=f"{WEBHOOK_URL}/{WEBHOOK_PATH}"
+                        )
+                    else:
+                        await app.updater.start_polling()
+                        
+                    logger.info("🚀 Bot started with PostgreSQL database storage...")
+                    
+                    await stop_event.wait()
+                finally:
+                    if app.updater.running:
+                        await app.updater.stop()
+                    await app.stop()
         finally:
-            # Clean up database connection when bot stops
+            # Persist pending activity and clean up database connection when bot stops
+            await afk_write_queue.join()
+            await flush_last_seen()
+            if backup_dirty:
+                save_data(load_data())
             await close_database()
+            if health_server:
+                health_server.close()
             
     except Exception as e:
         logger.error(f"❌ Critical error in main function: {e}")
         await close_database()
         raise
 
-class DummyHandler(BaseHTTPRequestHandler):
-    """Simple HTTP handler for health checks"""
-    
-    def do_GET(self):
-        logger.debug(f"🌐 Health check request from {self.client_address[0]}")
-        self.send_response(200)
-        self.end_headers()
-        self.wfile.write(b"AFK bot is alive!")
-
-    def do_HEAD(self):
-        logger.debug(f"🌐 HEAD request from {self.client_address[0]}")
-        self.send_response(200)
-        self.end_headers()
-    
-    def log_message(self, format, *args):
-        """Override to prevent default HTTP logging"""
+# Fixed health check responses; every probe gets the same bytes
+HEALTH_BODY = b"AFK bot is alive!"
+HEALTH_HEADERS = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: text/plain\r\n"
+    b"Content-Length: " + str(len(HEALTH_BODY)).encode() + b"\r\n"
+    b"Connection: close\r\n"
+    b"\r\n"
+)
+HEALTH_RESPONSE = HEALTH_HEADERS + HEALTH_BODY
+
+async def handle_health_check(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Answer an HTTP health check request"""
+    try:
+        request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+        logger.debug("🌐 Health check request from %s", writer.get_extra_info('peername'))
+        writer.write(HEALTH_HEADERS if request.startswith(b"HEAD ") else HEALTH_RESPONSE)
+        await writer.drain()
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
         pass
+    finally:
+        writer.close()
 
-def start_dummy_server():
-    """Start HTTP server for health checks"""
-    port = int(os.environ.get("PORT", 10000))
+async def start_health_server() -> Optional[asyncio.AbstractServer]:
+    """Start HTTP server for health checks on the bot's event loop"""
     try:
-        server = HTTPServer(("0.0.0.0", port), DummyHandler)
-        logger.info(f"🌐 HTTP health check server started on port {port}")
-        server.serve_forever()
+        server = await asyncio.start_server(handle_health_check, "0.0.0.0", HEALTH_PORT)
+        logger.info(f"🌐 HTTP health check server started on port {HEALTH_PORT}")
+        return server
     except Exception as e:
-        logger.error(f"❌ Error starting HTTP server: {e}")
+        logger.exception("❌ Error starting HTTP server: %s", e)
+        return None
 
 if __name__ == "__main__":
     logger.info("🎬 Application starting...")
     
     try:
-        # Start HTTP server in background
-        threading.Thread(target=start_dummy_server, daemon=True).start()
-        
+        import uvloop
+    except ImportError:
+        uvloop = None
+    
+    try:
         # Start main bot
-        asyncio.get_event_loop().run_until_complete(main())
+        if uvloop:
+            logger.info("⚡ Using uvloop event loop")
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("⏹️ Bot stopped by user")
-    except Exception as e:
-        logger.error(f"❌ Fatal error: {e}")
+    except Exception:
+        logger.exception("❌ Fatal error")
         raise